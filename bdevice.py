@@ -8,6 +8,8 @@
 
 from micropython import const
 
+_buf1 = bytearray(1)  # Shared by all instances for single byte access
+
 
 class BlockDevice:
     def __init__(self, nbits, nchips, chip_size):
@@ -15,21 +17,31 @@ class BlockDevice:
         self._a_bytes = chip_size * nchips  # Size of array
         self._nbits = nbits  # Block size in bits
         self._block_size = 2 ** nbits
-        self._rwbuf = bytearray(1)
 
     def __len__(self):
         return self._a_bytes
 
+    # Integer addresses are the common case so are tested first.
     def __setitem__(self, addr, value):
+        if isinstance(addr, int):
+            return self._write1(addr, value)
         if isinstance(addr, slice):
             return self._wslice(addr, value)
-        self._rwbuf[0] = value
-        self.readwrite(addr, self._rwbuf, False)
+        raise TypeError("Address must be an integer or slice")
 
     def __getitem__(self, addr):
+        if isinstance(addr, int):
+            return self._read1(addr)
         if isinstance(addr, slice):
             return self._rslice(addr)
-        return self.readwrite(addr, self._rwbuf, True)[0]
+        raise TypeError("Address must be an integer or slice")
+
+    def _read1(self, addr):  # Read a single byte
+        return self.readwrite(addr, _buf1, True)[0]
+
+    def _write1(self, addr, value):  # Write a single byte
+        _buf1[0] = value
+        self.readwrite(addr, _buf1, False)
 
     # Handle special cases of a slice. Always return a pair of positive indices.
     def _do_slice(self, addr):
@@ -119,10 +131,39 @@ class EepromDevice(BlockDevice):
 
 # Hardware agnostic base class for flash memory.
 
+try:
+    from uctypes import addressof
+except ImportError:  # Port lacks uctypes
+    addressof = None
+
 _RDBUFSIZE = const(32)  # Size of read buffer for erasure test
 
+# Return a memoryview of n bytes starting on an alignment boundary so that DMA
+# capable SPI hardware can use it without a bounce buffer. Without uctypes the
+# buffer has only the GC heap's natural alignment.
+def _aligned(n, alignment=32):
+    if addressof is None:
+        return memoryview(bytearray(n))
+    ba = bytearray(n + alignment - 1)
+    offs = -addressof(ba) & (alignment - 1)
+    return memoryview(ba)[offs : offs + n]
+
+
+# Return True if every bit set in new[offs:offs + n] is also set in old[:n]. A
+# NOR flash page can then be programmed from old to new without an erase.
+# Plain Python so that bdevice does not require viper: a subclass may replace
+# FlashDevice._covers with a faster version.
+def _covers(old, new, offs, n):
+    for i in range(n):
+        b = new[offs + i]
+        if old[i] & b != b:
+            return False
+    return True
+
 
 class FlashDevice(BlockDevice):
+    _covers = staticmethod(_covers)
+
     def __init__(self, nbits, nchips, chip_size, sec_size):
         super().__init__(nbits, nchips, chip_size)
         self.sec_size = sec_size
@@ -130,8 +171,8 @@ class FlashDevice(BlockDevice):
         self._fmask = self._cache_mask ^ 0x3FFFFFFF  # 4K -> 0x3ffff000
         self._buf = bytearray(_RDBUFSIZE)
         self._mvbuf = memoryview(self._buf)
-        self._cache = bytearray(sec_size)  # Cache always contains one sector
-        self._mvd = memoryview(self._cache)
+        self._evbuf = b"\xff" * _RDBUFSIZE  # Contents of an erased buffer
+        self._mvd = _aligned(sec_size)  # Cache always contains one sector
         self._acache = 0  # Address in chip of byte 0 of current cached sector.
         # A newly cached sector, or one which has been flushed, will be clean,
         # so .sync() will do nothing. If cache is modified, dirty will be set.
@@ -167,18 +208,22 @@ class FlashDevice(BlockDevice):
 
     # Performance enhancement: if cache intersects address range, update it first.
     # Currently in this case it would be written twice. This may be rare.
+    # Writing data identical to the cache contents leaves the cache clean, so a
+    # subsequent sync() does not needlessly erase and program the sector.
     def write(self, addr, mvb):
         nbytes = len(mvb)
-        acache = self._acache
         boff = 0  # Offset into buf.
         while nbytes:
-            if (addr & self._fmask) != acache:
+            if (addr & self._fmask) != self._acache:
                 self.sync()  # Erase sector and write out old data
                 self._fill_cache(addr)  # Cache sector which includes addr
             offs = addr & self._cache_mask  # Offset into cache
             npage = min(nbytes, self.sec_size - offs)  # No. of bytes in current sector
-            self._mvd[offs : offs + npage] = mvb[boff : boff + npage]
-            self._dirty = True  # Cache contents do not match those of chip
+            src = mvb[boff : boff + npage]
+            dst = self._mvd[offs : offs + npage]
+            if dst != src:
+                dst[:] = src
+                self._dirty = True  # Cache contents do not match those of chip
             nbytes -= npage
             boff += npage
             addr += npage
@@ -195,15 +240,27 @@ class FlashDevice(BlockDevice):
     def initialise(self):
         self._fill_cache(0)
 
-    # Return True if a sector is erased.
+    # Return True if a sector can be programmed with data (one sector) without
+    # being erased first, i.e. programming need only clear bits.
+    def can_program(self, addr, data):
+        mvb = self._mvbuf
+        covers = self._covers
+        for offs in range(0, self.sec_size, _RDBUFSIZE):
+            self.rdchip(addr + offs, mvb)
+            if not covers(mvb, data, offs, _RDBUFSIZE):
+                return False
+        return True
+
+    # Return True if a sector is erased. Each buffer is compared with a buffer
+    # of expected values in a single C-level comparison rather than per byte.
     def is_empty(self, addr, ev=0xFF):
         mvb = self._mvbuf
-        erased = True
+        buf = self._buf
+        evbuf = self._evbuf if ev == 0xFF else bytes((ev,)) * _RDBUFSIZE
         nbufs = self.sec_size // _RDBUFSIZE  # Read buffers per sector
         for _ in range(nbufs):
             self.rdchip(addr, mvb)
-            if any(True for x in mvb if x != ev):
-                erased = False
-                break
+            if buf != evbuf:
+                return False
             addr += _RDBUFSIZE
-        return erased
+        return True
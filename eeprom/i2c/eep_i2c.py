@@ -7,53 +7,52 @@ import uos
 import time
 from machine import I2C, Pin, SoftI2C
 from eeprom_i2c import EEPROM, T24C512
+from testrand import fill_rand, rand, SEED
+
+_device = None
 
 # Return an EEPROM array. Adapt for platforms other than Pyboard or chips
-# smaller than 64KiB.
+# smaller than 64KiB. The supported chips are rated for 400kHz (Fast mode).
 def get_eep():
+    global _device
+    if _device is not None:
+        return _device
     # Special code for Pyboard D: enable 3.3V output
     if uos.uname().machine.split(" ")[0][:4] == "PYBD":
         Pin.board.EN_3V3.value(1)
         time.sleep(0.1)  # Allow decouplers to charge
 
     if uos.uname().sysname == "esp8266":  # ESP8266 test fixture
-        eep = EEPROM(SoftI2C(scl=Pin(13, Pin.OPEN_DRAIN), sda=Pin(12, Pin.OPEN_DRAIN)), T24C512)
+        i2c = SoftI2C(scl=Pin(13, Pin.OPEN_DRAIN), sda=Pin(12, Pin.OPEN_DRAIN), freq=400_000)
+        eep = EEPROM(i2c, T24C512)
     elif uos.uname().sysname == "esp32":  # ChronoDot on ESP32-S3
-        eep = EEPROM(SoftI2C(scl=Pin(9, Pin.OPEN_DRAIN), sda=Pin(8, Pin.OPEN_DRAIN)), 256, addr=0x50)        
+        i2c = SoftI2C(scl=Pin(9, Pin.OPEN_DRAIN), sda=Pin(8, Pin.OPEN_DRAIN), freq=400_000)
+        eep = EEPROM(i2c, 256, addr=0x50)
     else:  # Pyboard D test fixture
-        eep = EEPROM(I2C(2), T24C512)
+        eep = EEPROM(I2C(2, freq=400_000), T24C512)
     print("Instantiated EEPROM")
+    _device = eep
     return eep
 
 
-# Yield pseudorandom bytes (random module not available on all ports)
-def psrand8(x=0x3FBA2):
-    while True:
-        x ^= (x & 0x1FFFF) << 13
-        x ^= x >> 17
-        x ^= (x & 0x1FFFFFF) << 5
-        yield x & 0xFF
-
-
-# Given a source of pseudorandom bytes yield pseudorandom 256 byte buffer.
-def psrand256(rand, ba=bytearray(256)):
-    while True:
-        for z in range(256):
-            ba[z] = next(rand)
-        yield ba
+_ZEROS = bytes(257)  # Test data allocated once
+_PATTERN256 = bytes(range(256))
 
 
 # Dumb file copy utility to help with managing EEPROM contents at the REPL.
+# Data is copied in 4KiB chunks via a single preallocated buffer.
 def cp(source, dest):
     if dest.endswith("/"):  # minimal way to allow
         dest = "".join((dest, source.split("/")[-1]))  # cp /sd/file /eeprom/
     try:
         with open(source, "rb") as infile:  # Caller should handle any OSError
             with open(dest, "wb") as outfile:  # e.g file not found
+                buf = bytearray(4096)  # A whole number of filesystem blocks
+                mv = memoryview(buf)
                 while True:
-                    buf = infile.read(100)
-                    outfile.write(buf)
-                    if len(buf) < 100:
+                    n = infile.readinto(buf)
+                    outfile.write(mv[:n])
+                    if n < 4096:
                         break
     except OSError as e:
         if e.errno == 28:
@@ -98,15 +97,16 @@ def test(eep=None):
     address_range = 256
     if sa + address_range > len(eep):
         sa = (len(eep) - address_range) // 2
-    for v in range(256):
-        eep[sa + v] = v
-    for v in range(256):
-        if eep[sa + v] != v:
-            print("Fail at address {} data {} should be {}".format(sa + v, eep[sa + v], v))
-            break
-    else:
+    eep[sa : sa + 256] = _PATTERN256  # Page writes, not 256 byte writes
+    buf = eep[sa : sa + 256]  # Verify with a single read
+    if buf == _PATTERN256:
         print("Test of byte addressing passed")
-    data = uos.urandom(30)
+    else:  # Only walk the data to report a failure
+        for v, g in enumerate(buf):
+            if g != v:
+                print("Fail at address {} data {} should be {}".format(sa + v, g, v))
+                break
+    data = rand(30)
     sa = 2000
     if sa + len(data) > len(eep):
         sa = (len(eep) - len(data)) // 2
@@ -134,7 +134,7 @@ def test(eep=None):
     pe = eep.get_page_size() + 1  # One byte past page
     eep[pe] = 0xFF
     write_length  = min(257, len(eep))
-    eep[:write_length] = b"\0" * write_length
+    eep[:write_length] = memoryview(_ZEROS)[:write_length]
     print("Test page size: ", end="")
     if eep[pe]:
         print("FAIL")
@@ -191,19 +191,27 @@ def cptest(eep=None):  # Assumes pre-existing filesystem of either type
 def full_test(eep=None):
     eep = eep if eep else get_eep()
     print("Testing with 256 byte blocks of random data...")
-    r = psrand8()  # Instantiate random byte generator
-    ps = psrand256(r)  # Random 256 byte blocks
+    # The driver copies each page to its own buffer and returns without waiting
+    # for the final write cycle, so one data buffer suffices: the next block is
+    # generated while the previous page is being programmed.
+    ba = bytearray(256)  # Pseudorandom data
+    state = SEED
     for sa in range(0, len(eep), 256):
         ea = sa + 256
-        eep[sa:ea] = next(ps)
-        print(f"Address {sa}..{ea} written\r", end="")
+        state = fill_rand(ba, 256, state)
+        eep.write(sa, ba)
+        if not sa & 0xFFF:  # Report progress every 4KiB
+            print(f"Address {sa}..{ea} written\r", end="")
     print()
-    r = psrand8()  # Instantiate new random byte generator with same seed
-    ps = psrand256(r)  # Random 256 byte blocks
+    state = SEED  # Regenerate the same data
+    vbuf = bytearray(256)  # Readback buffer: avoid allocation in loop
     for sa in range(0, len(eep), 256):
         ea = sa + 256
-        if eep[sa:ea] == next(ps):
-            print(f"Address {sa}..{ea} readback passed\r", end="")
+        state = fill_rand(ba, 256, state)
+        eep.readinto(sa, vbuf)
+        if vbuf == ba:
+            if not sa & 0xFFF:
+                print(f"Address {sa}..{ea} readback passed\r", end="")
         else:
             print(f"Address {sa}..{ea} readback failed.")
     print()
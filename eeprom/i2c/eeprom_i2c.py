@@ -7,10 +7,12 @@
 
 import time
 from micropython import const
+from struct import pack_into
 from bdevice import EepromDevice
 
 _ADDR = const(0x50)  # Base address of chip
 _MAX_CHIPS_COUNT = const(8)  # Max number of chips
+_NOCACHE = const(-0x1000000)  # Page cache address when cache is invalid
 
 T24C512 = const(65536)  # 64KiB 512Kbits
 T24C256 = const(32768)  # 32KiB 256Kbits
@@ -30,19 +32,47 @@ class EEPROM(EepromDevice):
         addr=_ADDR,
         max_chips_count=_MAX_CHIPS_COUNT,
         page_size=None,
+        skip_unchanged=False,
+        write_back=False,
     ):
         self._i2c = i2c
         if chip_size not in (T24C32, T24C64, T24C128, T24C256, T24C512) and verbose:
             print("Warning: possible unsupported chip. Size:", chip_size)
+        # Chip no. and offset from array address are a shift and a mask
+        self._c_mask = chip_size - 1
+        self._c_shift = len(bin(self._c_mask)) - 2  # No int.bit_length() on all ports
+        if chip_size != 1 << self._c_shift:
+            raise ValueError(f"Chip size must be a power of 2: {chip_size}")
         # Get no. of EEPROM chips
         nchips, min_chip_address = self.scan(verbose, chip_size, addr, max_chips_count)
         self._min_chip_address = min_chip_address
         self._i2c_addr = 0  # I2C address of current chip
-        self._buf1 = bytearray(1)
-        self._addrbuf = bytearray(2)  # Memory offset into current chip
+        self._la = 0  # Offset into current chip
+        self._busy = 0  # Bit n set: chip n has a write in progress
+        # Poll for readiness with an address-only write if the port supports it,
+        # otherwise with a one byte write which sets the high address byte.
+        try:
+            i2c.writeto(min_chip_address, b"")
+            self._probe = b""
+        except OSError:
+            self._probe = b"\0"
+        # Write buffer: two address bytes followed by page data. Page size
+        # detection may write up to 129 bytes with 256 byte pages.
+        self._txbuf = bytearray(2 + 256)
         self._onebyte = chip_size <= 256  # Single byte address
+        self._addrsize = 8 if self._onebyte else 16  # For readfrom_mem_into
+        self._rcache = b""  # Page cache is disabled until page size is known
+        self._rcaddr = _NOCACHE  # Array address of cached page
+        self._wback = False  # Write-back is disabled until page size is known
+        self._wdirty = False  # Cached page holds data not yet written to chip
+        self._mvc = None  # Page comparison is disabled until page size is known
         # superclass figures out _page_size and _page_mask
         super().__init__(block_size, nchips, chip_size, page_size, verbose)
+        self._rcache = bytearray(self._page_size)
+        self._txbuf = bytearray(2 + self._page_size)
+        if skip_unchanged:  # Read each page before writing it
+            self._mvc = memoryview(bytearray(self._page_size))
+        self._wback = write_back
 
     # Check for a valid hardware configuration
     def scan(self, verbose, chip_size, addr, max_chips_count):
@@ -61,46 +91,204 @@ class EEPROM(EepromDevice):
             print(s.format(nchips, chip_size * nchips))
         return nchips, min(eeproms)
 
-    def _wait_rdy(self):  # After a write, wait for device to become ready
-        self._buf1[0] = 0
+    # A page write is not waited on when issued. Instead the ACK poll is deferred
+    # until that chip is next accessed, so the write cycle (tWR) overlaps with any
+    # Python processing done between transfers and with accesses to other chips.
+    def _wait_rdy(self, i2c_addr):  # Wait for any pending write to a chip to complete
+        bit = 1 << (i2c_addr - self._min_chip_address)
+        if not self._busy & bit:
+            return
+        deadline = time.ticks_add(time.ticks_ms(), 50)  # Far longer than any tWR
+        delay = 50  # Poll interval (us): back off exponentially
         while True:
             try:
-                if self._i2c.writeto(self._i2c_addr, self._buf1):  # Poll ACK
-                    break
-            except OSError:
+                self._i2c.writeto(i2c_addr, self._probe)  # Poll ACK
+                break
+            except OSError:  # NACK: chip is busy
                 pass
-            finally:
-                time.sleep_ms(1)
+            if time.ticks_diff(deadline, time.ticks_ms()) < 0:
+                raise OSError("Device ready timeout.")
+            time.sleep_us(delay)
+            delay = min(delay << 1, 500)
+        self._busy &= ~bit
 
-    # Given an address, set ._i2c_addr and ._addrbuf and return the number of
-    # bytes that can be processed in the current page
-    def _getaddr(self, addr, nbytes):  # Set up _addrbuf and _i2c_addr
+    def sync(self):  # Ensure data has been committed to all chips
+        self._flush()
+        i2c_addr = self._min_chip_address
+        while self._busy:
+            self._wait_rdy(i2c_addr)
+            i2c_addr += 1
+
+    # As _wait_rdy but yields to the scheduler while the chip is busy.
+    async def _await_rdy(self, i2c_addr):
+        bit = 1 << (i2c_addr - self._min_chip_address)
+        if not self._busy & bit:
+            return
+        import asyncio
+
+        tstart = time.ticks_ms()
+        while True:
+            try:
+                self._i2c.writeto(i2c_addr, self._probe)  # Poll ACK
+                break
+            except OSError:  # NACK: chip is busy
+                pass
+            if time.ticks_diff(time.ticks_ms(), tstart) > 50:
+                raise OSError("Device ready timeout.")
+            await asyncio.sleep_ms(1)
+        self._busy &= ~bit
+
+    # Write a buffer one page at a time, allowing other tasks to run during
+    # each write cycle. Returns when the data has been committed to the chip.
+    async def awrite(self, addr, buf):
+        nbytes = len(buf)
+        mvb = memoryview(buf)
+        start = 0  # Offset into buf.
+        while nbytes > 0:
+            npage = self._getaddr(addr, nbytes)  # No. of bytes in current page
+            await self._await_rdy(self._i2c_addr)
+            self._wrdirect(addr, mvb[start : start + npage], npage)
+            nbytes -= npage
+            start += npage
+            addr += npage
+        i2c_addr = self._min_chip_address
+        while self._busy:
+            await self._await_rdy(i2c_addr)
+            i2c_addr += 1
+
+    # Given an address, set ._i2c_addr, ._la and the address bytes of ._txbuf and
+    # return the number of bytes that can be processed in the current page
+    def _getaddr(self, addr, nbytes):  # Set up _txbuf and _i2c_addr
         if addr >= self._a_bytes:
             raise RuntimeError("EEPROM Address is out of range")
-        ca, la = divmod(addr, self._c_bytes)  # ca == chip no, la == offset into chip
-        self._addrbuf[0] = (la >> 8) & 0xFF
-        self._addrbuf[1] = la & 0xFF
+        ca = addr >> self._c_shift  # Chip no.
+        la = addr & self._c_mask  # Offset into chip
+        self._la = la  # Memory address for reads
+        pack_into(">H", self._txbuf, 0, la)  # Big endian chip offset
         self._i2c_addr = self._min_chip_address + ca
-        pe = (la & self._page_mask) + self._page_size  # byte 0 of next page
+        pe = (la | ~self._page_mask) + 1  # byte 0 of next page
         return min(nbytes, pe - la)
 
+    # Single byte reads are served from a cache holding the page containing the
+    # byte, so sequential byte reads need one bus transaction per page.
+    def _read1(self, addr):
+        cache = self._rcache
+        offs = addr - self._rcaddr
+        if 0 <= offs < len(cache):
+            return cache[offs]
+        if not cache:  # Page size detection in progress
+            return super()._read1(addr)
+        pa = addr & self._page_mask  # Start of page
+        self._fill(pa)
+        return cache[addr - pa]
+
+    # Cache the page starting at array address pa
+    def _fill(self, pa):
+        self._flush()  # Cache is about to be overwritten
+        self._rcaddr = _NOCACHE  # Invalid if the read fails
+        self.readwrite(pa, self._rcache, True)
+        self._rcaddr = pa
+
+    # With write_back set, the cached page may hold data not yet on the chip
+    def _flush(self):
+        if self._wdirty:
+            self._wdirty = False
+            cache = self._rcache
+            self._write(self._rcaddr, memoryview(cache), len(cache))
+
+    # Write to the chip, keeping the page cache coherent
+    def _wrdirect(self, addr, mvb, nbytes):
+        rca = self._rcaddr
+        if addr < rca + len(self._rcache) and addr + nbytes > rca:
+            self._flush()  # Pending data must reach the chip first
+            self._rcaddr = _NOCACHE  # Write overlaps cached page
+        if nbytes:
+            self._write(addr, mvb, nbytes)
+
     # Read or write multiple bytes at an arbitrary address
     def readwrite(self, addr, buf, read):
         nbytes = len(buf)
         mvb = memoryview(buf)
+        if not read:
+            if self._wback and nbytes:
+                pa = addr & self._page_mask  # Start of page
+                offs = addr - pa
+                if offs + nbytes <= len(self._rcache):  # Write lies within one page
+                    if pa != self._rcaddr:
+                        self._fill(pa)
+                    self._rcache[offs : offs + nbytes] = mvb
+                    self._wdirty = True  # Deferred until another page is cached
+                    return buf
+            self._wrdirect(addr, mvb, nbytes)
+            return buf
+        rca = self._rcaddr
+        if self._wdirty and addr < rca + len(self._rcache) and addr + nbytes > rca:
+            self._flush()  # Read overlaps data not yet written
+        # Sequential reads are not limited by page boundaries: only a chip
+        # boundary requires a new transfer. Address calculation is inlined.
+        if addr + nbytes > self._a_bytes:
+            raise RuntimeError("EEPROM Address is out of range")
+        readinto = self._i2c.readfrom_mem_into  # Address write, repeated start, read
+        addrsize = self._addrsize
+        c_shift = self._c_shift
+        c_mask = self._c_mask
         start = 0  # Offset into buf.
         while nbytes > 0:
-            npage = self._getaddr(addr, nbytes)  # No. of bytes in current page
-            # assert npage > 0
-            # Offset address into chip: one or two bytes
-            vaddr = self._addrbuf[1:] if self._onebyte else self._addrbuf
-            if read:
-                self._i2c.writeto(self._i2c_addr, vaddr)
-                self._i2c.readfrom_into(self._i2c_addr, mvb[start : start + npage])
-            else:
-                self._i2c.writevto(self._i2c_addr, (vaddr, buf[start : start + npage]))
-                self._wait_rdy()
+            la = addr & c_mask  # Offset into chip
+            i2c_addr = self._min_chip_address + (addr >> c_shift)
+            nchip = min(nbytes, c_mask + 1 - la)  # No. of bytes in current chip
+            self._wait_rdy(i2c_addr)  # Chip may still be busy with a previous page
+            readinto(i2c_addr, la, mvb[start : start + nchip], addrsize=addrsize)
+            nbytes -= nchip
+            start += nchip
+            addr += nchip
+        return buf
+
+    # Explicit alternatives to slice notation: no slice object is created.
+    def write(self, addr, buf):
+        return self.readwrite(addr, buf, False)
+
+    def readinto(self, addr, buf):
+        return self.readwrite(addr, buf, True)
+
+    # Write a memoryview. Only the first page can start part way through a page,
+    # so subsequent pages just advance the chip offset. Full address calculation
+    # is only needed when a chip boundary is crossed. Each page is copied behind
+    # the address bytes so the bus sees a single contiguous buffer. If
+    # skip_unchanged was set, pages whose contents already match are not written.
+    def _write(self, addr, mvb, nbytes):
+        txbuf = self._txbuf
+        mvt = memoryview(txbuf)
+        hdr = 1 if self._onebyte else 0  # Start of one or two address bytes
+        writeto = self._i2c.writeto
+        readinto = self._i2c.readfrom_mem_into
+        addrsize = self._addrsize
+        mvc = self._mvc  # Buffer for existing page contents
+        c_mask = self._c_mask
+        ps = self._page_size
+        npage = self._getaddr(addr, nbytes)  # No. of bytes in first page
+        la = self._la
+        i2c_addr = self._i2c_addr  # Only changes at a chip boundary
+        bit = 1 << (i2c_addr - self._min_chip_address)  # Chip's busy flag
+        start = 0  # Offset into buf.
+        while True:
+            self._wait_rdy(i2c_addr)  # Chip may still be busy with a previous page
+            mvt[2 : 2 + npage] = mvb[start : start + npage]
+            if mvc is not None:
+                readinto(i2c_addr, la, mvc[:npage], addrsize=addrsize)
+            if mvc is None or mvc[:npage] != mvt[2 : 2 + npage]:
+                writeto(i2c_addr, mvt[hdr : 2 + npage])
+                self._busy |= bit
             nbytes -= npage
+            if nbytes <= 0:
+                break
             start += npage
-            addr += npage
-        return buf
+            la += npage
+            if la > c_mask:  # Next chip
+                npage = self._getaddr(addr + start, nbytes)
+                la = 0
+                i2c_addr = self._i2c_addr
+                bit = 1 << (i2c_addr - self._min_chip_address)
+            else:
+                pack_into(">H", txbuf, 0, la)
+                npage = min(nbytes, ps)
@@ -7,6 +7,7 @@ import uos
 import time
 from machine import SPI, Pin, SoftSPI
 from eeprom_spi import EEPROM
+from testrand import fill_rand, rand, SEED
 
 ESP8266 = uos.uname().sysname == "esp8266"
 # Add extra pins if using multiple chips
@@ -15,8 +16,14 @@ if ESP8266:
 else:
     cspins = (Pin(Pin.board.Y5, Pin.OUT, value=1), Pin(Pin.board.Y4, Pin.OUT, value=1))
 
+_device = None
+_stm = None  # Chip type of _device
+
 # Return an EEPROM array. Adapt for platforms other than Pyboard.
 def get_eep(stm):
+    global _device, _stm
+    if _device is not None and stm == _stm:
+        return _device
     if uos.uname().machine.split(" ")[0][:4] == "PYBD":
         Pin.board.EN_3V3.value(1)
         time.sleep(0.1)  # Allow decouplers to charge
@@ -36,37 +43,29 @@ def get_eep(stm):
             spi = SoftSPI(baudrate=20_000_000, sck=Pin("Y6"), miso=Pin("Y7"), mosi=Pin("Y8"))
         eep = EEPROM(spi, cspins, 128)
     print("Instantiated EEPROM")
+    _device = eep
+    _stm = stm
     return eep
 
 
-# Yield pseudorandom bytes (random module not available on all ports)
-def psrand8(x=0x3FBA2):
-    while True:
-        x ^= (x & 0x1FFFF) << 13
-        x ^= x >> 17
-        x ^= (x & 0x1FFFFFF) << 5
-        yield x & 0xFF
-
-
-# Given a source of pseudorandom bytes yield pseudorandom 256 byte buffer.
-def psrand256(rand, ba=bytearray(256)):
-    while True:
-        for z in range(256):
-            ba[z] = next(rand)
-        yield ba
+_ZEROS = bytes(257)  # Test data allocated once
+_PATTERN256 = bytes(range(256))
 
 
 # Dumb file copy utility to help with managing EEPROM contents at the REPL.
+# Data is copied in 4KiB chunks via a single preallocated buffer.
 def cp(source, dest):
     if dest.endswith("/"):  # minimal way to allow
         dest = "".join((dest, source.split("/")[-1]))  # cp /sd/file /eeprom/
     try:
         with open(source, "rb") as infile:  # Caller should handle any OSError
             with open(dest, "wb") as outfile:  # e.g file not found
+                buf = bytearray(4096)  # A whole number of filesystem blocks
+                mv = memoryview(buf)
                 while True:
-                    buf = infile.read(100)
-                    outfile.write(buf)
-                    if len(buf) < 100:
+                    n = infile.readinto(buf)
+                    outfile.write(mv[:n])
+                    if n < 4096:
                         break
     except OSError as e:
         if e.errno == 28:
@@ -106,15 +105,16 @@ def _testblock(eep, bs):
 def test(stm=False):
     eep = get_eep(stm)
     sa = 1000
-    for v in range(256):
-        eep[sa + v] = v
-    for v in range(256):
-        if eep[sa + v] != v:
-            print("Fail at address {} data {} should be {}".format(sa + v, eep[sa + v], v))
-            break
-    else:
+    eep[sa : sa + 256] = _PATTERN256  # Page writes, not 256 byte writes
+    buf = eep[sa : sa + 256]  # Verify with a single read
+    if buf == _PATTERN256:
         print("Test of byte addressing passed")
-    data = uos.urandom(30)
+    else:  # Only walk the data to report a failure
+        for v, g in enumerate(buf):
+            if g != v:
+                print("Fail at address {} data {} should be {}".format(sa + v, g, v))
+                break
+    data = rand(30)
     sa = 2000
     eep[sa : sa + 30] = data
     if eep[sa : sa + 30] == data:
@@ -139,7 +139,7 @@ def test(stm=False):
         print("Test chip boundary skipped: only one chip!")
     pe = eep.get_page_size()  # One byte past page
     eep[pe] = 0xFF
-    eep[:257] = b"\0" * 257
+    eep[:257] = _ZEROS
     print("Test page size: ", end="")
     if eep[pe]:
         print("FAIL")
@@ -195,19 +195,24 @@ def cptest(stm=False):  # Assumes pre-existing filesystem of either type
 def full_test(stm=False):
     eep = get_eep(stm)
     print("Testing with 256 byte blocks of random data...")
-    r = psrand8()  # Instantiate random byte generator
-    ps = psrand256(r)  # Random 256 byte blocks
+    ba = bytearray(256)  # Pseudorandom data
+    state = SEED
     for sa in range(0, len(eep), 256):
         ea = sa + 256
-        eep[sa:ea] = next(ps)
-        print(f"Address {sa}..{ea} written\r", end="")
+        state = fill_rand(ba, 256, state)
+        eep[sa:ea] = ba
+        if not sa & 0xFFF:  # Report progress every 4KiB
+            print(f"Address {sa}..{ea} written\r", end="")
     print()
-    r = psrand8()  # Instantiate new random byte generator with same seed
-    ps = psrand256(r)  # Random 256 byte blocks
+    state = SEED  # Regenerate the same data
+    vbuf = bytearray(256)  # Readback buffer: avoid allocation in loop
     for sa in range(0, len(eep), 256):
         ea = sa + 256
-        if eep[sa:ea] == next(ps):
-            print(f"Address {sa}..{ea} readback passed\r", end="")
+        state = fill_rand(ba, 256, state)
+        eep.readwrite(sa, vbuf, True)
+        if vbuf == ba:
+            if not sa & 0xFFF:
+                print(f"Address {sa}..{ea} readback passed\r", end="")
         else:
             print(f"Address {sa}..{ea} readback failed.")
     print()
@@ -7,15 +7,24 @@
 # Thanks are due to Abel Deuring for help in diagnosing and fixing a page size issue.
 
 import time
-from os import urandom
+import micropython
 from micropython import const
+from struct import pack_into
 from bdevice import EepromDevice
 
+try:
+    from os import urandom
+except ImportError:  # Port lacks urandom: scan falls back to hashing the tick count
+    urandom = None
+
 # Supported instruction set - common to both chips:
 _READ = const(3)
 _WRITE = const(2)
 _WREN = const(6)  # Write enable
 _RDSR = const(5)  # Read status register
+_RDSR_CMD = bytes((_RDSR,))
+_WREN_CMD = bytes((_WREN,))
+_ZEROS = bytes(256)  # Erased page data (max page size)
 
 # Logical EEPROM device comprising one or more physical chips sharing an SPI bus.
 # args: SPI bus, tuple of CS Pin instances, chip size in KiB
@@ -23,55 +32,81 @@ _RDSR = const(5)  # Read status register
 # block_size: Sector size for filesystems. See docs.
 # erok: True if chip supports erase.
 # page_size: None is auto detect. See docs.
+# write_back: True to cache single byte writes in RAM. See docs.
 class EEPROM(EepromDevice):
-    def __init__(self, spi, cspins, size, verbose=True, block_size=9, page_size=None):
+    def __init__(
+        self,
+        spi,
+        cspins,
+        size,
+        verbose=True,
+        block_size=9,
+        page_size=None,
+        write_back=False,
+    ):
         if size not in (64, 128, 256):
             print(f"Warning: possible unsupported chip. Size: {size}KiB")
         self._spi = spi
+        # Bound bus methods are looked up once, not on every transfer
+        self._spi_write = spi.write
+        self._spi_readinto = spi.readinto
         self._cspins = cspins
-        self._ccs = None  # Chip select Pin object for current chip
         self._size = size * 1024  # Chip size in bytes
+        # Chip no. and offset from array address are a shift and a mask
+        self._c_mask = self._size - 1
+        self._c_shift = len(bin(self._c_mask)) - 2  # No int.bit_length() on all ports
+        if self._size != 1 << self._c_shift:
+            raise ValueError(f"Chip size must be a power of 2: {size}KiB")
         self._bufp = bytearray(5)  # instruction + 3 byte address + 1 byte value
         self._mvp = memoryview(self._bufp)  # cost-free slicing
+        self._mvsr = self._mvp[:1]  # Status register read receive buffer
+        self._mvhdr = self._mvp[:4]  # Command and 3 byte address
+        # Page writes send command, address and data as one transfer
+        self._mvw = memoryview(bytearray(4 + 256))
+        self._wbpage = None  # Write-back cache: enabled after page size is known
+        self._wbaddr = -1  # Array address of cached page, -1 if none
+        self._wblo = 0  # Modified bytes are self._wbpage[self._wblo : self._wbhi]
+        self._wbhi = 0  # 0 if unmodified
         if verbose:  # Test for presence of devices
             self.scan()
         # superclass figures out _page_size and _page_mask
         super().__init__(block_size, len(cspins), self._size, page_size, verbose)
+        if write_back:  # Page size detection relies on uncached single byte writes
+            self._wbpage = memoryview(bytearray(256))
         if verbose:
             print(f"Total EEPROM size {self._a_bytes:,} bytes.")
 
     # Low level device presence detect. Reads a location, then writes to it. If
     # a write value is passed, uses that, otherwise writes the one's complement
-    # of the value read.
+    # of the value read. The command buffer holds the data byte, so the two
+    # calls per chip made by scan allocate nothing.
     def _devtest(self, cs, la, v=None):
-        buf = bytearray(1)
         mvp = self._mvp
-        # mvp[:] = b"\0" * 5  # test with addr 0
-        mvp[1] = la >> 16
-        mvp[2] = (la >> 8) & 0xFF
-        mvp[3] = la & 0xFF
-        mvp[0] = _READ
+        mvhdr = self._mvhdr
+        mvv = mvp[4:]  # Data byte
+        pack_into(">I", mvp, 0, _READ << 24 | la)  # Command and address
         cs(0)
-        self._spi.write(mvp[:4])
-        res = self._spi.read(1)
+        self._spi_write(mvhdr)
+        self._spi_readinto(mvv)
         cs(1)
-        mvp[0] = _WREN
+        res = mvv[0]
         cs(0)
-        self._spi.write(mvp[:1])
+        self._spi_write(_WREN_CMD)
         cs(1)
         mvp[0] = _WRITE
+        mvv[0] = res ^ 0xFF if v is None else v
         cs(0)
-        self._spi.write(mvp[:4])
-        buf[0] = res[0] ^ 0xFF if v is None else v
-        self._spi.write(buf)
+        self._spi_write(mvp)
         cs(1)  # Trigger write start
-        self._ccs = cs
-        self._wait_rdy()  # Wait until done (6ms max)
-        return res[0]
+        self._wait_rdy(cs)  # Wait until done (6ms max)
+        return res
 
     def scan(self):
         # Generate a random address to minimise wear
-        la = int.from_bytes(urandom(3), "little") % self._size
+        if urandom is not None:
+            la = int.from_bytes(urandom(3), "little") % self._size
+        else:  # Multiplicative hash: operands are small so the product is a small int
+            la = ((time.ticks_us() & 0x3FFF) * 40503) % self._size
         for n, cs in enumerate(self._cspins):
             old = self._devtest(cs, la)
             new = self._devtest(cs, la, old)
@@ -80,69 +115,249 @@ class EEPROM(EepromDevice):
         print(f"{n + 1} chips detected.")
         return n
 
+    # Zero the array. Pages are written directly rather than via readwrite.
     def erase(self):
-        mvp = self._mvp
-        block = b"\0" * 256
-        for n in range(0, self._a_bytes, 256):
-            self[n : n + 256] = block
+        self.sync()
+        self._wbaddr = -1
+        write = self._spi_write
+        ps = self._page_size
+        mvw = self._mvw
+        mvw[4 : 4 + ps] = memoryview(_ZEROS)[:ps]
+        mvpage = mvw[: 4 + ps]  # Command, address and a page of zeros
+        for cs in self._cspins:
+            for la in range(0, self._c_bytes, ps):
+                pack_into(">I", mvw, 0, _WRITE << 24 | la)
+                cs(0)
+                write(_WREN_CMD)
+                cs(1)
+                cs(0)
+                write(mvpage)
+                cs(1)  # Trigger write start
+                self._wait_rdy(cs)  # Wait until done (6ms max)
 
-    def _wait_rdy(self):  # After a write, wait for device to become ready
-        mvp = self._mvp
-        cs = self._ccs  # Chip is already current
+    # The poll loop allocates nothing: transmit and receive buffers are prebuilt.
+    # Both supported chips output the status register continuously while CS is
+    # held low, so RDSR is sent once and each byte clocked in is a fresh status.
+    def _wait_rdy(self, cs):  # After a write, wait for device to become ready
+        mvsr = self._mvsr
+        readinto = self._spi_readinto
         tstart = time.ticks_ms()
+        cs(0)
+        self._spi_write(_RDSR_CMD)
         while True:
-            mvp[0] = _RDSR
-            cs(0)
-            self._spi.write_readinto(mvp[:2], mvp[:2])
-            cs(1)
-            if not mvp[1]:  # We never set BP0 or BP1 so ready state is 0.
+            readinto(mvsr)
+            if not mvsr[0]:  # We never set BP0 or BP1 so ready state is 0.
                 break
-            time.sleep_ms(1)
+            time.sleep_us(200)  # Fine grained: write may finish well within 5ms
             if time.ticks_diff(time.ticks_ms(), tstart) > 1000:
+                cs(1)
                 raise OSError("Device ready timeout.")
+        cs(1)
 
-    # Given an address, set current chip select and address buffer.
-    # Return the number of bytes that can be processed in the current page.
-    def _getaddr(self, addr, nbytes):
-        if addr >= self._a_bytes:
-            raise RuntimeError("EEPROM Address is out of range")
-        ca, la = divmod(addr, self._c_bytes)  # ca == chip no, la == offset into chip
-        self._ccs = self._cspins[ca]  # Current chip select
-        mvp = self._mvp
-        mvp[1] = la >> 16
-        mvp[2] = (la >> 8) & 0xFF
-        mvp[3] = la & 0xFF
-        pe = (la & self._page_mask) + self._page_size  # byte 0 of next page
-        return min(nbytes, pe - la)
+    # Write-back cache. Single byte writes update a RAM copy of one page. The
+    # modified span is written in one page write when a byte in another page is
+    # written, when the array is otherwise accessed, or on sync().
+    def _write1(self, addr, value):
+        wbpage = self._wbpage
+        if wbpage is None:
+            return super()._write1(addr, value)
+        pa = addr & self._page_mask  # Page address
+        if pa != self._wbaddr:
+            self.sync()
+            self.readwrite_mv(pa, wbpage[: self._page_size], True)
+            self._wbaddr = pa
+        offs = addr - pa
+        wbpage[offs] = value
+        if not self._wbhi:
+            self._wblo = offs
+            self._wbhi = offs + 1
+        elif offs < self._wblo:
+            self._wblo = offs
+        elif offs >= self._wbhi:
+            self._wbhi = offs + 1
+
+    def _read1(self, addr):
+        pa = self._wbaddr
+        if pa >= 0 and addr & self._page_mask == pa:
+            return self._wbpage[addr - pa]
+        return super()._read1(addr)
+
+    def sync(self):  # Write out any modified data in the write-back cache
+        if self._wbhi:
+            pa = self._wbaddr
+            lo = self._wblo
+            self._wbaddr = -1  # Cache is bypassed for this write
+            self.readwrite_mv(pa + lo, self._wbpage[lo : self._wbhi], False)
+            self._wbaddr = pa
+            self._wbhi = 0
 
     # Read or write multiple bytes at an arbitrary address
     def readwrite(self, addr, buf, read):
-        nbytes = len(buf)
-        mvb = memoryview(buf)
+        self.readwrite_mv(addr, memoryview(buf), read)
+        return buf
+
+    def write(self, addr, buf):
+        return self.readwrite(addr, buf, False)
+
+    def readinto(self, addr, buf):
+        return self.readwrite(addr, buf, True)
+
+    # As readwrite but mvb must be a memoryview, which is used without wrapping.
+    # The loops are pure integer and slice work between SPI calls: native code
+    # speeds them up. Chip and page geometry are loaded into locals once per call.
+    @micropython.native
+    def readwrite_mv(self, addr, mvb, read):
+        nbytes = len(mvb)
+        if addr < 0 or addr + nbytes > self._a_bytes:
+            raise RuntimeError("EEPROM Address is out of range")
+        if self._wbaddr >= 0:  # Write-back cache holds a page
+            self.sync()
+            if not read:
+                self._wbaddr = -1  # Cached page may be overwritten
         mvp = self._mvp
+        mvhdr = self._mvhdr
+        cspins = self._cspins
+        c_bytes = self._c_bytes
+        c_shift = self._c_shift
+        c_mask = self._c_mask
+        ps = self._page_size
+        pmask = self._page_mask
+        write = self._spi_write
         start = 0  # Offset into buf.
-        while nbytes > 0:
-            npage = self._getaddr(addr, nbytes)  # No. of bytes in current page
-            cs = self._ccs
-            assert npage > 0
-            if read:
-                mvp[0] = _READ
+        if read:
+            # Both chips read sequentially across page boundaries to the end of
+            # the chip, so a read is one transfer per chip: a single chip array
+            # never does chip boundary arithmetic more than once.
+            readinto = self._spi_readinto
+            while nbytes > 0:
+                la = addr & c_mask  # Offset into chip
+                cs = cspins[addr >> c_shift]
+                nchip = c_bytes - la  # No. of bytes in current chip
+                if nchip > nbytes:
+                    nchip = nbytes
+                pack_into(">I", mvp, 0, _READ << 24 | la)  # Command and address
                 cs(0)
-                self._spi.write(mvp[:4])
-                self._spi.readinto(mvb[start : start + npage])
+                write(mvhdr)
+                readinto(mvb[start : start + nchip])
                 cs(1)
-            else:
-                mvp[0] = _WREN
+                nbytes -= nchip
+                start += nchip
+                addr += nchip
+            return mvb
+        # Write. Only the first page in a chip can start part way through a page,
+        # so subsequent pages just advance the chip offset. Chip select and full
+        # address calculation are only needed when a chip boundary is crossed.
+        # Each page is prepared while the previous one is being written: the
+        # chip is polled only when the next page is ready to send. The first
+        # page on a new chip is sent without waiting for the previous chip,
+        # which is polled before the next chip change or on return.
+        wait_rdy = self._wait_rdy
+        mvw = self._mvw
+        busy = None  # Chip with a write in progress
+        prev = None  # Previous chip: may also be busy
+        while nbytes > 0:
+            la = addr & c_mask
+            cs = cspins[addr >> c_shift]
+            if busy is not None:  # Chip boundary crossed
+                if prev is not None:
+                    wait_rdy(prev)
+                prev = busy
+                busy = None
+            npage = (la & pmask) + ps - la  # No. of bytes in first page
+            nchip = c_bytes - la  # No. of bytes in current chip
+            if nchip > nbytes:
+                nchip = nbytes
+            if npage > nchip:
+                npage = nchip
+            nbytes -= nchip
+            addr += nchip
+            while True:
+                pack_into(">I", mvw, 0, _WRITE << 24 | la)  # Command and address
+                mvw[4 : 4 + npage] = mvb[start : start + npage]
+                if busy is not None:
+                    wait_rdy(busy)  # Wait for previous page (6ms max)
                 cs(0)
-                self._spi.write(mvp[:1])
+                write(_WREN_CMD)
                 cs(1)
-                mvp[0] = _WRITE
                 cs(0)
-                self._spi.write(mvp[:4])
-                self._spi.write(mvb[start : start + npage])
+                write(mvw[: 4 + npage])
                 cs(1)  # Trigger write start
-                self._wait_rdy()  # Wait until done (6ms max)
+                busy = cs
+                start += npage
+                nchip -= npage
+                if not nchip:
+                    break
+                la += npage
+                npage = ps if nchip > ps else nchip
+        if prev is not None:
+            wait_rdy(prev)
+        if busy is not None:
+            wait_rdy(busy)
+        return mvb
+
+    # Write a list or tuple of buffers to consecutive addresses starting at addr.
+    # Data from successive buffers is gathered into page writes without being
+    # concatenated, so small records sharing a page cost one write cycle. As in
+    # readwrite_mv, each page is gathered while the previous one is written.
+    @micropython.native
+    def writev(self, addr, bufs):
+        nbytes = 0
+        for buf in bufs:
+            nbytes += len(buf)
+        if addr < 0 or addr + nbytes > self._a_bytes:
+            raise RuntimeError("EEPROM Address is out of range")
+        if self._wbaddr >= 0:  # Write out and discard write-back cache
+            self.sync()
+            self._wbaddr = -1
+        mvw = self._mvw
+        cspins = self._cspins
+        c_shift = self._c_shift
+        c_mask = self._c_mask
+        ps = self._page_size
+        pmask = self._page_mask
+        write = self._spi_write
+        wait_rdy = self._wait_rdy
+        it = iter(bufs)
+        mvb = None
+        boff = 0  # Offset into current buffer
+        blen = 0  # Length of current buffer
+        busy = None  # Chip with a write in progress
+        prev = None  # Previous chip: may also be busy
+        while nbytes > 0:
+            la = addr & c_mask
+            cs = cspins[addr >> c_shift]
+            if busy is not None and busy is not cs:  # Chip boundary crossed
+                if prev is not None:
+                    wait_rdy(prev)
+                prev = busy
+                busy = None
+            npage = (la & pmask) + ps - la  # No. of bytes in current page
+            if npage > nbytes:
+                npage = nbytes
+            pack_into(">I", mvw, 0, _WRITE << 24 | la)  # Command and address
+            woff = 4  # Offset into mvw
+            while woff < 4 + npage:  # Gather page data from the buffers
+                if boff == blen:  # Current buffer exhausted
+                    mvb = memoryview(next(it))
+                    boff = 0
+                    blen = len(mvb)
+                    continue
+                nw = min(4 + npage - woff, blen - boff)
+                mvw[woff : woff + nw] = mvb[boff : boff + nw]
+                boff += nw
+                woff += nw
+            if busy is not None:
+                wait_rdy(busy)  # Wait for previous page (6ms max)
+            cs(0)
+            write(_WREN_CMD)
+            cs(1)
+            cs(0)
+            write(mvw[:woff])
+            cs(1)  # Trigger write start
+            busy = cs
             nbytes -= npage
-            start += npage
             addr += npage
-        return buf
+        if prev is not None:
+            wait_rdy(prev)
+        if busy is not None:
+            wait_rdy(busy)
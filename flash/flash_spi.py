@@ -4,7 +4,9 @@
 # Copyright (c) 2019-2020 Peter Hinch
 
 import time
+import micropython
 from micropython import const
+from struct import pack_into
 from bdevice import FlashDevice
 
 # Supported instruction set:
@@ -17,22 +19,53 @@ _CMDS4BA = b"\x13\x12\x21"
 # No address
 _WREN = const(6)  # Write enable
 _RDSR1 = const(5)  # Read status register 1
+_RDSR1_CMD = bytes((_RDSR1, 0))  # Status register read transmit data
+_WREN_CMD = bytes((_WREN,))
 _RDID = const(0x9F)  # Read manufacturer ID
+_RDID_CMD = bytes((_RDID, 0, 0, 0))  # ID read transmit data
 _CE = const(0xC7)  # Chip erase (takes minutes)
 
 _SEC_SIZE = const(4096)  # Flash sector size 0x1000
+_ATIMEOUT = const(2000)  # ms. sync_async ready timeout: exceeds max sector erase time
+
+
+# Return True if buf[offs:offs + n] is all 0xff (erased state)
+@micropython.viper
+def _blank(buf: ptr8, offs: int, n: int) -> bool:
+    for i in range(offs, offs + n):
+        if buf[i] != 0xFF:
+            return False
+    return True
+
+
+# Viper version of bdevice._covers: see FlashDevice.can_program
+@micropython.viper
+def _covers(old: ptr8, new: ptr8, offs: int, n: int) -> bool:
+    for i in range(n):
+        b = new[offs + i]
+        if old[i] & b != b:
+            return False
+    return True
+
 
 # Logical Flash device comprising one or more physical chips sharing an SPI bus.
 class FLASH(FlashDevice):
+    _covers = staticmethod(_covers)
+
     def __init__(
         self, spi, cspins, size=None, verbose=True, sec_size=_SEC_SIZE, block_size=9, cmd5=None
     ):
         self._spi = spi
         self._cspins = cspins
         self._ccs = None  # Chip select Pin object for current chip
+        self._alock = None  # asyncio.Lock serialising sync_async calls
+        self._aflushing = False  # True while sync_async is writing to the chip
         self._bufp = bytearray(6)  # instruction + 4 byte address + 1 byte value
         self._mvp = memoryview(self._bufp)  # cost-free slicing
+        self._mvsr = self._mvp[:2]  # Status register read receive buffer
         self._page_size = 256  # Write uses 256 byte pages.
+        # Page program command, address and data sent as a single buffer
+        self._mvw = memoryview(bytearray(5 + self._page_size))
         # Defensive code: application should have done the following.
         # Pyboard D 3V3 output may just have been switched on.
         for cs in cspins:  # Deselect all chips
@@ -50,6 +83,12 @@ class FLASH(FlashDevice):
         else:
             self._cmds = _CMDS4BA
             self._cmdlen = 5
+        cmds = self._cmds
+        self._cmd_read = cmds[_READ]  # Opcodes as ints: no per-use indexing
+        self._cmd_se = cmds[_SE]
+        self._mvhdr = self._mvp[: self._cmdlen]  # Command and address
+        self._mvw[0] = cmds[_PP]
+        self._mvpp = self._mvw[: self._cmdlen + self._page_size]  # Page program
 
         self.initialise()  # Initially cache sector 0
 
@@ -57,11 +96,10 @@ class FLASH(FlashDevice):
     # Scan: return chip size in KiB as read from ID.
     def scan(self, verbose, size):
         mvp = self._mvp
+        mvid = mvp[:4]  # Receive buffer: the transmit data is a constant
         for n, cs in enumerate(self._cspins):
-            mvp[:] = b"\0\0\0\0\0\0"
-            mvp[0] = _RDID
             cs(0)
-            self._spi.write_readinto(mvp[:4], mvp[:4])
+            self._spi.write_readinto(_RDID_CMD, mvid)
             cs(1)
             scansize = 1 << (mvp[3] - 10)
             if size is None:
@@ -79,11 +117,11 @@ class FLASH(FlashDevice):
 
     # Chip erase. Can take minutes.
     def erase(self):
+        self._check_idle()
         mvp = self._mvp
         for cs in self._cspins:  # For each chip
-            mvp[0] = _WREN
             cs(0)
-            self._spi.write(mvp[:1])  # Enable write
+            self._spi.write(_WREN_CMD)  # Enable write
             cs(1)
             mvp[0] = _CE
             cs(0)
@@ -92,30 +130,38 @@ class FLASH(FlashDevice):
             self._wait_rdy()  # Wait for erase to complete
 
     # **** INTERFACE FOR BASE CLASS ****
-    # Write cache to a sector starting at byte address addr
+    # Write cache to a sector starting at byte address addr. Each page is
+    # prepared while the chip is busy with the erase or the previous page.
+    # Blank pages are skipped: programming them would not change the chip.
     def flush(self, cache, addr):  # cache is memoryview into buffer
-        self._sector_erase(addr)
-        mvp = self._mvp
-        nbytes = self.sec_size
+        self._check_idle()
+        busy = self._sector_erase(addr, cache)
         ps = self._page_size
-        start = 0  # Current offset into cache buffer
-        while nbytes > 0:
-            # write one page at a time
-            self._getaddr(addr, 1)
-            cs = self._ccs  # Current chip select from _getaddr
-            mvp[0] = _WREN
-            cs(0)
-            self._spi.write(mvp[:1])  # Enable write
-            cs(1)
-            mvp[0] = self._cmds[_PP]
-            cs(0)
-            self._spi.write(mvp[: self._cmdlen])  # Start write
-            self._spi.write(cache[start : start + ps])
-            cs(1)
-            self._wait_rdy()  # Wait for write to complete
-            nbytes -= ps
-            start += ps
-            addr += ps
+        for start in range(0, self.sec_size, ps):
+            if _blank(cache, start, ps):
+                continue
+            self._pp_prep(cache, start, addr + start)
+            if busy:
+                self._wait_rdy()  # Wait for erase or previous write
+            self._pp_send()
+            busy = True
+        if busy:
+            self._wait_rdy()
+
+    # As flush but yields to the scheduler while the chip is busy
+    async def _aflush(self, cache, addr):
+        busy = self._sector_erase(addr, cache)
+        ps = self._page_size
+        for start in range(0, self.sec_size, ps):
+            if _blank(cache, start, ps):
+                continue
+            self._pp_prep(cache, start, addr + start)
+            if busy:
+                await self._await_rdy()
+            self._pp_send()
+            busy = True
+        if busy:
+            await self._await_rdy()
 
     # Read from chip into a memoryview. Address range guaranteed not to be cached.
     def rdchip(self, addr, mvb):
@@ -125,9 +171,9 @@ class FLASH(FlashDevice):
         while nbytes > 0:
             npage = self._getaddr(addr, nbytes)  # No. of bytes in current chip
             cs = self._ccs
-            mvp[0] = self._cmds[_READ]
+            mvp[0] = self._cmd_read
             cs(0)
-            self._spi.write(mvp[: self._cmdlen])
+            self._spi.write(self._mvhdr)
             self._spi.readinto(mvb[start : start + npage])
             cs(1)
             nbytes -= npage
@@ -137,23 +183,94 @@ class FLASH(FlashDevice):
     # Read or write multiple bytes at an arbitrary address.
     # **** Also part of API ****
     def readwrite(self, addr, buf, read):
+        self._check_idle()
         mvb = memoryview(buf)
         self.read(addr, mvb) if read else self.write(addr, mvb)
         return buf
 
+    # Also reached via ioctl. Must not report success while sync_async is
+    # still writing the cache out.
+    def sync(self):
+        self._check_idle()
+        return super().sync()
+
+    # Asynchronous version of sync(): write out a modified cache, allowing other
+    # tasks to run while the chip erases and programs the sector. Concurrent
+    # calls are serialised by a lock. Until the flush completes any other access
+    # to the device raises RuntimeError: the cache and the chip are in use.
+    async def sync_async(self):
+        import asyncio
+
+        if self._alock is None:
+            self._alock = asyncio.Lock()
+        async with self._alock:
+            if self._dirty:
+                self._dirty = False  # Cleared first: a failed flush restores it
+                self._aflushing = True
+                try:
+                    await self._aflush(self._mvd, self._acache)
+                except BaseException:
+                    self._dirty = True  # Chip contents are not known to match
+                    raise
+                finally:
+                    self._aflushing = False
+        return 0
+
     # **** INTERNAL METHODS ****
+    def _check_idle(self):
+        if self._aflushing:
+            raise RuntimeError("Flash busy: sync_async in progress")
+
+    # Copy page program command, address and one page of data to ._mvw
+    def _pp_prep(self, cache, start, addr):
+        self._getaddr(addr, 1)
+        cmdlen = self._cmdlen
+        ps = self._page_size
+        mvw = self._mvw
+        mvw[1:cmdlen] = self._mvp[1:cmdlen]  # Address
+        mvw[cmdlen : cmdlen + ps] = cache[start : start + ps]
+
+    # Program the page prepared by _pp_prep. Does not wait for completion.
+    def _pp_send(self):
+        cs = self._ccs  # Current chip select from _getaddr
+        cs(0)
+        self._spi.write(_WREN_CMD)  # Enable write
+        cs(1)
+        cs(0)
+        self._spi.write(self._mvpp)  # Command, address and data
+        cs(1)
+
+    # The poll loop allocates nothing: transmit and receive buffers are prebuilt.
     def _wait_rdy(self):  # After a write, wait for device to become ready
-        mvp = self._mvp
+        mvsr = self._mvsr
         cs = self._ccs  # Chip is already current
+        write_readinto = self._spi.write_readinto
         while True:  # TODO read status register 2, raise OSError on nonzero.
-            mvp[0] = _RDSR1
             cs(0)
-            self._spi.write_readinto(mvp[:2], mvp[:2])
+            write_readinto(_RDSR1_CMD, mvsr)
             cs(1)
-            if not (mvp[1] & 1):
+            if not (mvsr[1] & 1):
                 break
             time.sleep_ms(1)
 
+    # As _wait_rdy but yields to the scheduler while the chip is busy. Raises
+    # OSError if the chip does not become ready.
+    async def _await_rdy(self):
+        import asyncio
+
+        mvsr = self._mvsr
+        cs = self._ccs  # Chip is already current
+        tstart = time.ticks_ms()
+        while True:
+            cs(0)
+            self._spi.write_readinto(_RDSR1_CMD, mvsr)
+            cs(1)
+            if not (mvsr[1] & 1):
+                break
+            if time.ticks_diff(time.ticks_ms(), tstart) > _ATIMEOUT:
+                raise OSError("Device ready timeout.")
+            await asyncio.sleep_ms(1)
+
     # Given an address, set current chip select and address buffer.
     # Return the number of bytes that can be processed in the current chip.
     def _getaddr(self, addr, nbytes):
@@ -161,29 +278,26 @@ class FLASH(FlashDevice):
             raise RuntimeError("Flash Address is out of range")
         ca, la = divmod(addr, self._c_bytes)  # ca == chip no, la == offset into chip
         self._ccs = self._cspins[ca]  # Current chip select
-        cmdlen = self._cmdlen
-        mvp = self._mvp[:cmdlen]
-        if cmdlen > 3:
-            mvp[-4] = la >> 24
-        mvp[-3] = la >> 16 & 0xFF
-        mvp[-2] = (la >> 8) & 0xFF
-        mvp[-1] = la & 0xFF
-        pe = (addr & -self._c_bytes) + self._c_bytes  # Byte 0 of next chip
-        return min(nbytes, pe - la)
-
-    # Erase sector. Address is start byte address of sector. Optimisation: skip
-    # if sector is already erased.
-    def _sector_erase(self, addr):
-        if not self.is_empty(addr):
+        # 3 or 4 byte address ends at byte cmdlen - 1. With a 3 byte address
+        # byte 0 is written but the caller overwrites it with the command.
+        pack_into(">I", self._mvp, self._cmdlen - 4, la)
+        return min(nbytes, self._c_bytes - la)  # Bytes remaining in chip
+
+    # Start erasing a sector. Address is start byte address of sector. Return
+    # True if an erase is in progress: the caller must wait for it. Optimisation:
+    # skip if the new contents can be programmed without erasure. This includes
+    # the case where the sector is already erased.
+    def _sector_erase(self, addr, cache):
+        if not self.can_program(addr, cache):
             self._getaddr(addr, 1)
             cs = self._ccs  # Current chip select from _getaddr
             mvp = self._mvp
-            mvp[0] = _WREN
             cs(0)
-            self._spi.write(mvp[:1])  # Enable write
+            self._spi.write(_WREN_CMD)  # Enable write
             cs(1)
-            mvp[0] = self._cmds[_SE]
+            mvp[0] = self._cmd_se
             cs(0)
-            self._spi.write(mvp[: self._cmdlen])  # Start erase
+            self._spi.write(self._mvhdr)  # Start erase
             cs(1)
-            self._wait_rdy()  # Wait for erase to complete
+            return True
+        return False
@@ -7,12 +7,18 @@ import uos
 import time
 from machine import SPI, Pin
 from flash_spi import FLASH
+from testrand import rand
+
+_device = None
 
 # **** ADAPT THIS FUNCTION ****
 
 # Return an EEPROM array. Adapt for platforms other than Pyboard.
 # May want to set chip size and baudrate.
 def get_device():
+    global _device
+    if _device is not None:
+        return _device
     if uos.uname().machine.split(" ")[0][:4] == "PYBD":
         Pin.board.EN_3V3.value(1)
         time.sleep(0.1)
@@ -20,25 +26,32 @@ def get_device():
     cspins = (Pin(Pin.board.Y5, Pin.OUT, value=1), Pin(Pin.board.Y4, Pin.OUT, value=1))
     flash = FLASH(SPI(2, baudrate=20_000_000), cspins)
     print("Instantiated Flash")
+    _device = flash
     return flash
 
 
 # **** END OF USER-ADAPTED CODE ****
 
 # Dumb file copy utility to help with managing EEPROM contents at the REPL.
+# Data is copied in 4KiB chunks via a single preallocated buffer.
 def cp(source, dest):
     if dest.endswith("/"):  # minimal way to allow
         dest = "".join((dest, source.split("/")[-1]))  # cp /sd/file /fl_ext/
     with open(source, "rb") as infile:  # Caller should handle any OSError
         with open(dest, "wb") as outfile:  # e.g file not found
+            buf = bytearray(4096)  # A whole number of filesystem blocks
+            mv = memoryview(buf)
             while True:
-                buf = infile.read(100)
-                outfile.write(buf)
-                if len(buf) < 100:
+                n = infile.readinto(buf)
+                outfile.write(mv[:n])
+                if n < 4096:
                     break
 
 
 # ***** TEST OF DRIVER *****
+_PATTERN256 = bytes(range(256))  # Test data allocated once
+
+
 def _testblock(eep, bs):
     d0 = b"this >"
     d1 = b"<is the boundary"
@@ -69,17 +82,16 @@ def _testblock(eep, bs):
 def test():
     eep = get_device()
     sa = 1000
-    for v in range(256):
-        eep[sa + v] = v
-    for v in range(256):
-        if eep[sa + v] != v:
-            print(
-                "Fail at address {} data {} should be {}".format(sa + v, eep[sa + v], v)
-            )
-            break
-    else:
+    eep[sa : sa + 256] = _PATTERN256  # One multi-byte write, not 256 single bytes
+    buf = eep[sa : sa + 256]  # Verify with a single read
+    if buf == _PATTERN256:
         print("Test of byte addressing passed")
-    data = uos.urandom(30)
+    else:  # Only walk the data to report a failure
+        for v, g in enumerate(buf):
+            if g != v:
+                print("Fail at address {} data {} should be {}".format(sa + v, g, v))
+                break
+    data = rand(30)
     sa = 2000
     eep[sa : sa + 30] = data
     if eep[sa : sa + 30] == data:
@@ -139,12 +151,10 @@ def cptest():
 # ***** TEST OF HARDWARE *****
 def full_test(count=10):
     flash = get_device()
+    amax = flash._a_bytes - 256  # Highest start address
     for n in range(count):
-        data = uos.urandom(256)
-        while True:
-            sa = int.from_bytes(uos.urandom(4), "little") & 0x3FFFFFFF
-            if sa < (flash._a_bytes - 256):
-                break
+        data = rand(256)
+        sa = int.from_bytes(rand(4), "little") % amax
         flash[sa : sa + 256] = data
         flash.sync()
         got = flash[sa : sa + 256]
@@ -7,10 +7,13 @@ import uos
 from machine import SPI, Pin
 from flash_spi import FLASH
 from flash_test import get_device
+from testrand import rand
 
 directory = "/fl_ext"
-a = bytearray(range(256))
-b = bytearray(256)
+a = bytearray(range(256)) * 16
+b = bytearray(4096)
+mva = memoryview(a)  # Slices compare without copying
+mvb = memoryview(b)
 files = {}  # n:length
 errors = 0
 
@@ -20,14 +23,14 @@ def fname(n):
 
 
 def fcreate(n):  # Create a binary file of random length
-    length = int.from_bytes(uos.urandom(2), "little") + 1  # 1-65536 bytes
+    length = int.from_bytes(rand(2), "little") + 1  # 1-65536 bytes
     linit = length
     with open(fname(n), "wb") as f:
         while length:
-            nw = min(length, 256)
-            f.write(a[:nw])
+            nw = min(length, 4096)
+            f.write(mva[:nw])
             length -= nw
-    files[n] = length
+    files[n] = linit
     return linit
 
 
@@ -38,17 +41,18 @@ def fcheck(n):
             nr = f.readinto(b)
             if not nr:
                 return False
-            if a[:nr] != b[:nr]:
+            if mva[:nr] != mvb[:nr]:
                 return False
             length -= nr
     return True
 
 
-def check_all():
+def check_all(verbose=False):
     global errors
     for n in files:
         if fcheck(n):
-            print("File {:d} OK".format(n))
+            if verbose:
+                print("File {:d} OK".format(n))
         else:
             print("Error in file", n)
             errors += 1
@@ -60,23 +64,33 @@ def remove_all():
         uos.remove(fname(n))
 
 
-def main():
+# Create nfiles files then rewrite them five at a time, checking all files after
+# every check_every batches of rewrites and at the end. Fewer files suit small
+# arrays.
+def main(nfiles=128, check_every=10, verbose=False):
+    if nfiles < 1 or check_every < 1:
+        raise ValueError("nfiles and check_every must be at least 1")
     eep = get_device()
     try:
         uos.mount(eep, directory)
     except OSError:  # Already mounted
         pass
-    for n in range(128):
+    for n in range(nfiles):
         length = fcreate(n)
-        print("Created", n, length)
-    print("Created files", files)
-    check_all()
-    for _ in range(100):
-        for x in range(5):  # Rewrite 5 files with new lengths
-            n = int.from_bytes(uos.urandom(1), "little") & 0x7F
+        if verbose:
+            print("Created", n, length)
+    if verbose:
+        print("Created files", files)
+    check_all(verbose)
+    for x in range(100):
+        for _ in range(5):  # Rewrite 5 files with new lengths
+            n = int.from_bytes(rand(2), "little") % nfiles
             length = fcreate(n)
-            print("Rewrote", n, length)
-        check_all()
+            if verbose:
+                print("Rewrote", n, length)
+        if x < 99 and not (x + 1) % check_every:
+            check_all(verbose)
+    check_all(verbose)  # Always verify the final batches of rewrites
     remove_all()
 
 
@@ -6,21 +6,31 @@
 import uos
 from machine import SPI, Pin
 from flash_spi import FLASH
+from testrand import rand
 
 cspins = (Pin(5, Pin.OUT, value=1), Pin(14, Pin.OUT, value=1))
 
 spi = SPI(-1, baudrate=20_000_000, sck=Pin(4), miso=Pin(0), mosi=Pin(2))
 
 
+_device = None
+
+
 def get_flash():
+    global _device
+    if _device is not None:
+        return _device
     flash = FLASH(spi, cspins)
     print("Instantiated Flash")
+    _device = flash
     return flash
 
 
 directory = "/fl_ext"
-a = bytearray(range(256))  # Data to write
-b = bytearray(256)  # Data to read back
+a = bytearray(range(256)) * 16  # Data to write
+b = bytearray(4096)  # Data to read back
+mva = memoryview(a)  # Slices compare without copying
+mvb = memoryview(b)
 files = {}  # n:length
 errors = 0
 
@@ -30,14 +40,14 @@ def fname(n):
 
 
 def fcreate(n):  # Create a binary file of random length
-    length = int.from_bytes(uos.urandom(2), "little") + 1  # 1-65536 bytes
+    length = int.from_bytes(rand(2), "little") + 1  # 1-65536 bytes
     linit = length
     with open(fname(n), "wb") as f:
         while length:
-            nw = min(length, 256)
-            f.write(a[:nw])
+            nw = min(length, 4096)
+            f.write(mva[:nw])
             length -= nw
-    files[n] = length
+    files[n] = linit
     return linit
 
 
@@ -48,17 +58,18 @@ def fcheck(n):
             nr = f.readinto(b)
             if not nr:
                 return False
-            if a[:nr] != b[:nr]:
+            if mva[:nr] != mvb[:nr]:
                 return False
             length -= nr
     return True
 
 
-def check_all():
+def check_all(verbose=False):
     global errors
     for n in files:
         if fcheck(n):
-            print("File {:d} OK".format(n))
+            if verbose:
+                print("File {:d} OK".format(n))
         else:
             print("Error in file", n)
             errors += 1
@@ -70,7 +81,7 @@ def remove_all():
         uos.remove(fname(n))
 
 
-def flash_test(format=False):
+def flash_test(format=False, verbose=False):
     eep = get_flash()
     if format:
         uos.VfsLfs2.mkfs(eep)
@@ -80,15 +91,18 @@ def flash_test(format=False):
         pass
     for n in range(128):
         length = fcreate(n)
-        print("Created", n, length)
-    print("Created files", files)
-    check_all()
+        if verbose:
+            print("Created", n, length)
+    if verbose:
+        print("Created files", files)
+    check_all(verbose)
     for _ in range(100):
         for x in range(5):  # Rewrite 5 files with new lengths
-            n = int.from_bytes(uos.urandom(1), "little") & 0x7F
+            n = int.from_bytes(rand(1), "little") & 0x7F
             length = fcreate(n)
-            print("Rewrote", n, length)
-        check_all()
+            if verbose:
+                print("Rewrote", n, length)
+        check_all(verbose)
     remove_all()
 
 
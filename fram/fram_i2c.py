@@ -7,6 +7,8 @@ from micropython import const
 from bdevice import BlockDevice
 
 _SIZE = const(32768)  # Chip size 32KiB
+_CHIP_SHIFT = const(15)  # log2(_SIZE)
+_CHIP_MASK = const(0x7FFF)  # _SIZE - 1
 _ADDR = const(0x50)  # FRAM I2C address 0x50 to 0x57
 _FRAM_SLAVE_ID = const(0xF8)  # FRAM device ID location
 _MANF_ID = const(0x0A)
@@ -17,12 +19,14 @@ _PRODUCT_ID = const(0x510)
 class FRAM(BlockDevice):
     def __init__(self, i2c, verbose=True, block_size=9):
         self._i2c = i2c
-        self._buf1 = bytearray(1)
-        self._addrbuf = bytearray(2)  # Memory offset into current chip
+        # Writes send address and data from one buffer. Its size allows a
+        # filesystem block to be written in a single transfer.
+        self._wmax = 1 << block_size
+        self._mvw = memoryview(bytearray(2 + self._wmax))
+        self._addrbuf = self._mvw[:2]  # Memory offset into current chip
         self._buf3 = bytearray(3)
         self._nchips = self.scan(verbose, _SIZE)
         super().__init__(block_size, self._nchips, _SIZE)
-        self._i2c_addr = None  # i2c address of current chip
 
     def scan(self, verbose, chip_size):
         devices = self._i2c.scan()
@@ -49,33 +53,35 @@ class FRAM(BlockDevice):
         productID = ((res[1] & 0x0F) << 8) + res[2]
         return manufacturerID == _MANF_ID and productID == _PRODUCT_ID
 
-    # In the context of FRAM a page == a chip.
-    # Args: an address and a no. of bytes. Set ._i2c_addr to correct chip.
-    # Return the no. of bytes available to access on that chip.
-    def _getaddr(self, addr, nbytes):  # Set up _addrbuf and i2c_addr
-        if addr >= self._a_bytes:
-            raise RuntimeError("FRAM Address is out of range")
-        ca, la = divmod(addr, self._c_bytes)  # ca == chip no, la == offset into chip
-        self._addrbuf[0] = (la >> 8) & 0xFF
-        self._addrbuf[1] = la & 0xFF
-        self._i2c_addr = _ADDR + ca
-        return min(nbytes, self._c_bytes - la)
-
+    # In the context of FRAM a page == a chip. Attributes are bound to locals
+    # and chip addressing is done inline, once per chip rather than via a method.
     def readwrite(self, addr, buf, read):
         nbytes = len(buf)
-        mvb = memoryview(buf)
+        if addr < 0 or addr + nbytes > self._a_bytes:
+            raise RuntimeError("FRAM Address is out of range")
+        # A memoryview passed by the caller is used as is: no allocation.
+        mvb = buf if isinstance(buf, memoryview) else memoryview(buf)
+        mvw = self._mvw
+        addrbuf = self._addrbuf
+        i2c = self._i2c
+        wmax = self._wmax
         start = 0  # Offset into buf.
         while nbytes > 0:
-            npage = self._getaddr(addr, nbytes)  # No of bytes that fit on current chip
-            if read:
-                self._i2c.writeto(self._i2c_addr, self._addrbuf)
-                self._i2c.readfrom_into(
-                    self._i2c_addr, mvb[start : start + npage]
-                )  # Sequential read
-            else:
-                self._i2c.writevto(
-                    self._i2c_addr, (self._addrbuf, buf[start : start + npage])
+            # Chip size is a power of 2: shift and mask rather than divmod. With a
+            # single chip the shift is always 0.
+            la = addr & _CHIP_MASK  # Offset into chip
+            i2c_addr = _ADDR + (addr >> _CHIP_SHIFT)
+            npage = min(nbytes, _SIZE - la)  # No of bytes that fit on current chip
+            if read:  # Address write and sequential read with a repeated start
+                i2c.readfrom_mem_into(
+                    i2c_addr, la, mvb[start : start + npage], addrsize=16
                 )
+            else:  # Longer writes are split into block sized transfers
+                addrbuf[0] = la >> 8
+                addrbuf[1] = la & 0xFF
+                npage = min(npage, wmax)
+                mvw[2 : 2 + npage] = mvb[start : start + npage]
+                i2c.writeto(i2c_addr, mvw[: 2 + npage])
             nbytes -= npage
             start += npage
             addr += npage
@@ -15,6 +15,7 @@ from bdevice import BlockDevice
 
 # Command set
 _WREN = const(6)
+_WREN_CMD = bytes((_WREN,))
 _WRDI = const(4)
 _RDSR = const(5)  # Read status reg
 _WRSR = const(1)
@@ -23,6 +24,7 @@ _WRITE = const(2)
 _RDID = const(0x9F)
 # _FSTRD = const(0x0b)  No obvious difference to _READ
 _SLEEP = const(0xB9)
+_SMALL = const(64)  # Writes up to this size are sent in one transfer with the header
 
 
 class FRAM(BlockDevice):
@@ -32,17 +34,21 @@ class FRAM(BlockDevice):
         super().__init__(block_size, len(cspins), size * 1024)
         self._spi = spi
         self._cspins = cspins
-        self._ccs = None  # Chip select Pin object for current chip
-        self._bufp = bytearray(5)  # instruction + 3 byte address + 1 byte value
+        # Chip size is a power of 2: chip no. and offset are a shift and a mask
+        self._c_mask = self._c_bytes - 1
+        self._c_shift = len(bin(self._c_mask)) - 2  # No int.bit_length() on all ports
+        # Instruction + 3 byte address + short write data
+        self._bufp = bytearray(4 + _SMALL)
         mvp = memoryview(self._bufp)  # cost-free slicing
         self._mvp = mvp
-        # Check hardware
+        # Check hardware and set up the status register: one pass per chip
         density = 8 if size == 256 else 9
+        mvid = mvp[:5]
+        mvsr = mvp[:2]
         for n, cs in enumerate(cspins):
-            mvp[:] = b"\0\0\0\0\0"
-            mvp[0] = _RDID
+            mvp[0] = _RDID  # Remaining transmit bytes are don't-care
             cs(0)
-            self._spi.write_readinto(mvp, mvp)
+            self._spi.write_readinto(mvid, mvid)
             cs(1)
             # Ignore bits labelled "proprietary"
             if mvp[1] != 4 or mvp[2] != 0x7F:
@@ -51,27 +57,23 @@ class FRAM(BlockDevice):
             if (mvp[3] & 0x1F) != density:
                 s = "FRAM at cspins[{}] is incorrect size."
                 raise RuntimeError(s.format(n))
-        if verbose:
-            s = "Total FRAM size {} bytes in {} devices."
-            print(s.format(self._a_bytes, n + 1))
-        # Set up status register on each chip
-        for cs in cspins:
             self._wrctrl(cs, True)
             mvp[0] = _WRSR
             mvp[1] = 0  # No block protect or SR protect
             cs(0)
-            self._spi.write(mvp[:2])
+            self._spi.write(mvsr)
             cs(1)
             self._wrctrl(cs, False)  # Disable write to array
-
-        for n, cs in enumerate(self._cspins):
             mvp[0] = _RDSR
             cs(0)
-            self._spi.write_readinto(mvp[:2], mvp[:2])
+            self._spi.write_readinto(mvsr, mvsr)
             cs(1)
             if mvp[1]:
                 s = "FRAM has bad status at cspins[{}]."
                 raise RuntimeError(s.format(n))
+        if verbose:
+            s = "Total FRAM size {} bytes in {} devices."
+            print(s.format(self._a_bytes, n + 1))
 
     def _wrctrl(self, cs, en):  # Enable/Disable device write
         mvp = self._mvp
@@ -91,44 +93,51 @@ class FRAM(BlockDevice):
     # time.sleep_us(500)
     # cs(1)
 
-    # Given an address, set current chip select and address buffer.
-    # Return the number of bytes that can be processed in the current page.
-    # Use of 256 byte pages may be unnecessary for FRAM but cost is minimal.
-    def _getaddr(self, addr, nbytes):
-        if addr >= self._a_bytes:
-            raise RuntimeError("FRAM Address is out of range")
-        ca, la = divmod(addr, self._c_bytes)  # ca == chip no, la == offset into chip
-        self._ccs = self._cspins[ca]  # Current chip select
-        mvp = self._mvp
-        mvp[1] = la >> 16
-        mvp[2] = (la >> 8) & 0xFF
-        mvp[3] = la & 0xFF
-        pe = (addr & ~0xFF) + 0x100  # byte 0 of next page
-        return min(nbytes, pe - la)
-
-    # Interface to bdevice
+    # Interface to bdevice. Attributes are bound to locals and chip addressing
+    # is done inline. FRAM has no pages: with CS held low, reads and writes run
+    # sequentially up to the end of the chip, so one command and address
+    # suffices per chip.
     def readwrite(self, addr, buf, read):
         nbytes = len(buf)
-        mvb = memoryview(buf)
+        if addr < 0 or addr + nbytes > self._a_bytes:
+            raise RuntimeError("FRAM Address is out of range")
+        # A memoryview passed by the caller is used as is: no allocation.
+        mvb = buf if isinstance(buf, memoryview) else memoryview(buf)
         mvp = self._mvp
+        mvhdr = mvp[:4]  # Command and address
+        spi = self._spi
+        cspins = self._cspins
+        c_bytes = self._c_bytes
+        c_mask = self._c_mask
+        c_shift = self._c_shift
         start = 0  # Offset into buf.
         while nbytes > 0:
-            npage = self._getaddr(addr, nbytes)  # No of bytes that fit on current page
-            cs = self._ccs
+            # Chip size is a power of 2: shift and mask rather than divmod
+            la = addr & c_mask  # Offset into chip
+            cs = cspins[addr >> c_shift]
+            mvp[1] = la >> 16
+            mvp[2] = (la >> 8) & 0xFF
+            mvp[3] = la & 0xFF
+            npage = min(nbytes, c_bytes - la)  # No of bytes that fit on current chip
             if read:
                 mvp[0] = _READ
                 cs(0)
-                self._spi.write(mvp[:4])
-                self._spi.readinto(mvb[start : start + npage])
+                spi.write(mvhdr)
+                spi.readinto(mvb[start : start + npage])
                 cs(1)
             else:
-                self._wrctrl(cs, True)
-                mvp[0] = _WRITE
                 cs(0)
-                self._spi.write(mvp[:4])
-                self._spi.write(mvb[start : start + npage])
+                spi.write(_WREN_CMD)  # Enable write
                 cs(1)
-                self._wrctrl(cs, False)
+                mvp[0] = _WRITE
+                cs(0)
+                if npage <= _SMALL:  # Copy data after the header: one transfer
+                    mvp[4 : 4 + npage] = mvb[start : start + npage]
+                    spi.write(mvp[: 4 + npage])
+                else:  # Avoid copying long writes
+                    spi.write(mvhdr)
+                    spi.write(mvb[start : start + npage])
+                cs(1)  # WEL is reset by the chip at the end of a WRITE: no WRDI needed
             nbytes -= npage
             start += npage
             addr += npage
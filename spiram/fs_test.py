@@ -4,12 +4,17 @@
 # are OK.
 
 import os
+from micropython import const
 from machine import SPI, Pin
 from spiram_test import get_spiram
+from testrand import rand
 
 directory = "/ram"
-a = bytearray(range(256))
-b = bytearray(256)
+_BUFSIZE = const(1024)  # Two filesystem blocks: a file is at most one call
+a = bytearray(range(256)) * (_BUFSIZE // 256)  # a[i] == i & 0xFF
+b = bytearray(_BUFSIZE)
+mva = memoryview(a)  # Slices compare without copying
+mvb = memoryview(b)
 files = {}  # n:length
 errors = 0
 
@@ -19,15 +24,15 @@ def fname(n):
 
 
 def fcreate(n):  # Create a binary file of random length
-    length = int.from_bytes(os.urandom(2), "little") + 1  # 1-65536 bytes
+    length = int.from_bytes(rand(2), "little") + 1  # 1-65536 bytes
     length &= 0x3FF  # 1-1023 for FRAM
     linit = length
     with open(fname(n), "wb") as f:
         while length:
-            nw = min(length, 256)
-            f.write(a[:nw])
+            nw = min(length, _BUFSIZE)
+            f.write(mva[:nw])
             length -= nw
-    files[n] = length
+    files[n] = linit
     return linit
 
 
@@ -38,7 +43,7 @@ def fcheck(n):
             nr = f.readinto(b)
             if not nr:
                 return False
-            if a[:nr] != b[:nr]:
+            if mva[:nr] != mvb[:nr]:
                 return False
             length -= nr
     return True
@@ -74,7 +79,7 @@ def main():
     check_all()
     for _ in range(100):
         for x in range(5):  # Rewrite 5 files with new lengths
-            n = int.from_bytes(os.urandom(1), "little") & 0x7F
+            n = int.from_bytes(rand(1), "little") & 0x7F
             length = fcreate(n)
             print("Rewrote", n, length)
         check_all()
@@ -8,6 +8,7 @@
 # Copyright (c) 2020 Peter Hinch
 
 from micropython import const
+from struct import pack_into
 from bdevice import BlockDevice
 
 # Command set
@@ -16,6 +17,7 @@ _READ = const(3)
 _RSTEN = const(0x66)
 _RESET = const(0x99)
 _RDID = const(0x9F)
+_RDID_CMD = bytes((_RDID, 0, 0, 0, 0, 0))  # ID read transmit data
 
 
 class SPIRAM(BlockDevice):
@@ -23,18 +25,25 @@ class SPIRAM(BlockDevice):
         if size != 8192:
             print("SPIRAM size other than 8192KiB may not work.")
         super().__init__(block_size, len(cspins), size * 1024)
+        # Chip no. and offset from array address are a shift and a mask
+        self._c_mask = self._c_bytes - 1
+        self._c_shift = len(bin(self._c_mask)) - 2  # No int.bit_length() on all ports
+        if self._c_bytes != 1 << self._c_shift:
+            raise ValueError(f"SPIRAM size must be a power of 2: {size}KiB")
         self._spi = spi
+        # Bound bus methods are looked up once, not on every transfer
+        self._spi_write = spi.write
+        self._spi_readinto = spi.readinto
         self._cspins = cspins
-        self._ccs = None  # Chip select Pin object for current chip
+        self._cs1 = cspins[0] if len(cspins) == 1 else None  # Single chip fast path
         bufp = bytearray(6)  # instruction + 3 byte address + 2 byte value
         mvp = memoryview(bufp)  # cost-free slicing
         self._mvp = mvp
+        self._mvhdr = mvp[:4]  # Command and 3 byte address
         # Check hardware
         for n, cs in enumerate(cspins):
-            mvp[:] = b"\0\0\0\0\0\0"
-            mvp[0] = _RDID
             cs(0)
-            self._spi.write_readinto(mvp, mvp)
+            self._spi.write_readinto(_RDID_CMD, mvp)
             cs(1)
             if mvp[4] != 0x0D or mvp[5] != 0x5D:
                 print("Warning: expected manufacturer ID not found.")
@@ -43,46 +52,49 @@ class SPIRAM(BlockDevice):
             s = "Total SPIRAM size {} KiB in {} devices."
             print(s.format(self._a_bytes // 1024, n + 1))
 
-    # Given an address, set current chip select and address buffer.
-    # Return the number of bytes that can be processed in the current chip.
-    def _getaddr(self, addr, nbytes):
-        if addr >= self._a_bytes:
-            raise RuntimeError("SPIRAM Address is out of range")
-        ca, la = divmod(addr, self._c_bytes)  # ca == chip no, la == offset into chip
-        self._ccs = self._cspins[ca]  # Current chip select
-        mvp = self._mvp
-        mvp[1] = la >> 16
-        mvp[2] = (la >> 8) & 0xFF
-        mvp[3] = la & 0xFF
-        pe = (addr & -self._c_bytes) + self._c_bytes  # Byte 0 of next chip
-        return min(nbytes, pe - la)
-
-    # Interface to bdevice
+    # Interface to bdevice. SPIRAM has no pages: with CS held low, reads and
+    # writes run sequentially to the end of the chip, so one command and address
+    # suffices per chip. With a single chip there are no boundaries to handle
+    # and the whole buffer is one transfer.
     def readwrite(self, addr, buf, read):
         nbytes = len(buf)
-        mvb = memoryview(buf)
-        mvp = self._mvp
+        if addr < 0 or addr + nbytes > self._a_bytes:
+            raise RuntimeError("SPIRAM Address is out of range")
+        # A memoryview passed by the caller is used as is: no allocation.
+        mvb = buf if isinstance(buf, memoryview) else memoryview(buf)
+        mvhdr = self._mvhdr
+        write = self._spi_write
+        xfer = self._spi_readinto if read else write
+        cmd = _READ if read else _WRITE
+        cs1 = self._cs1
         start = 0  # Offset into buf.
         while nbytes > 0:
-            nchip = self._getaddr(addr, nbytes)  # No of bytes that fit on current chip
-            cs = self._ccs
-            if read:
-                mvp[0] = _READ
-                cs(0)
-                self._spi.write(mvp[:4])
-                self._spi.readinto(mvb[start : start + nchip])
-                cs(1)
-            else:
-                mvp[0] = _WRITE
-                cs(0)
-                self._spi.write(mvp[:4])
-                self._spi.write(mvb[start : start + nchip])
-                cs(1)
+            if cs1 is None:
+                la = addr & self._c_mask  # Offset into chip
+                cs = self._cspins[addr >> self._c_shift]
+                nchip = self._c_bytes - la  # Bytes remaining in chip
+                if nchip > nbytes:
+                    nchip = nbytes
+            else:  # Single chip
+                la = addr
+                cs = cs1
+                nchip = nbytes
+            pack_into(">I", mvhdr, 0, cmd << 24 | la)
+            cs(0)
+            write(mvhdr)
+            xfer(mvb[start : start + nchip])
+            cs(1)
             nbytes -= nchip
             start += nchip
             addr += nchip
         return buf
 
+    def write(self, addr, buf):
+        return self.readwrite(addr, buf, False)
+
+    def readinto(self, addr, buf):
+        return self.readwrite(addr, buf, True)
+
 
 # Reset is unnecessary because it restores the default power-up state.
 # def _reset(self, cs, bufr = bytearray(1)):
@@ -9,16 +9,23 @@ import os
 import time
 from machine import SPI, Pin
 from spiram import SPIRAM
+from testrand import fill_rand, rand, SEED
 
 cspins = (Pin(Pin.board.Y5, Pin.OUT, value=1), Pin(Pin.board.Y4, Pin.OUT, value=1))
 
+_device = None
+
 # Return an RAM array. Adapt for platforms other than Pyboard.
 def get_spiram():
+    global _device
+    if _device is not None:
+        return _device
     if os.uname().machine.split(" ")[0][:4] == "PYBD":
         Pin.board.EN_3V3.value(1)
         time.sleep(0.1)  # Allow decouplers to charge
     ram = SPIRAM(SPI(2, baudrate=25_000_000), cspins)
     print("Instantiated RAM")
+    _device = ram
     return ram
 
 
@@ -28,14 +35,19 @@ def cp(source, dest):
         dest = "".join((dest, source.split("/")[-1]))  # cp /sd/file /ram/
     with open(source, "rb") as infile:  # Caller should handle any OSError
         with open(dest, "wb") as outfile:  # e.g file not found
+            buf = bytearray(4096)  # A whole number of filesystem blocks
+            mv = memoryview(buf)
             while True:
-                buf = infile.read(100)
-                outfile.write(buf)
-                if len(buf) < 100:
+                n = infile.readinto(buf)
+                outfile.write(mv[:n])
+                if n < 4096:
                     break
 
 
 # ***** TEST OF DRIVER *****
+_PATTERN256 = bytes(range(256))  # Test data allocated once
+
+
 def _testblock(eep, bs):
     d0 = b"this >"
     d1 = b"<is the boundary"
@@ -65,18 +77,18 @@ def _testblock(eep, bs):
 
 def test():
     ram = get_spiram()
+    buf = bytearray(256)  # Readback buffer
     sa = 1000
-    for v in range(256):
-        ram[sa + v] = v
-    for v in range(256):
-        if ram[sa + v] != v:
-            print(
-                "Fail at address {} data {} should be {}".format(sa + v, ram[sa + v], v)
-            )
-            break
-    else:
+    ram.write(sa, _PATTERN256)  # One multi-byte write, not 256 single bytes
+    ram.readinto(sa, buf)  # Verify with a single read
+    if buf == _PATTERN256:
         print("Test of byte addressing passed")
-    data = os.urandom(30)
+    else:  # Only walk the data to report a failure
+        for v, g in enumerate(buf):
+            if g != v:
+                print("Fail at address {} data {} should be {}".format(sa + v, g, v))
+                break
+    data = rand(30)
     sa = 2000
     ram[sa : sa + 30] = data
     if ram[sa : sa + 30] == data:
@@ -125,12 +137,20 @@ def cptest():
 def full_test():
     bsize = 2048
     ram = get_spiram()
+    data = bytearray(bsize)  # Pseudorandom data, different for each block
+    buf = bytearray(bsize)  # Readback buffer is reused for every block
+    state = SEED
     page = 0
+    fails = 0
     for sa in range(0, len(ram), bsize):
-        data = os.urandom(bsize)
-        ram[sa : sa + bsize] = data
-        if ram[sa : sa + bsize] == data:
-            print("Page {} passed".format(page))
-        else:
-            print("Page {} readback failed.".format(page))
+        state = fill_rand(data, bsize, state)
+        ram.write(sa, data)
+        ram.readinto(sa, buf)
+        if buf != data:
+            print("\nPage {} readback failed.".format(page))  # Last progress line ends in \r
+            fails += 1
+        elif not page & 0x3F:  # Console output is slow: report every 64 pages
+            print("Page {} passed\r".format(page), end="")
         page += 1
+    print()
+    print("{} pages tested, {} failed.".format(page, fails))
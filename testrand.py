@@ -0,0 +1,40 @@
+# testrand.py Pseudorandom test data shared by the hardware test programs.
+
+# Released under the MIT License (MIT). See LICENSE.
+# Copyright (c) 2024 Peter Hinch
+
+import uos
+import micropython
+from micropython import const
+
+_POOLSIZE = const(4096)
+SEED = const(0x3FBA2)  # Initial state: a test regenerates its data from this
+
+# Fill a buffer with n pseudorandom bytes (random module not available on all
+# ports). Returns the xorshift state for the next call.
+@micropython.viper
+def fill_rand(buf: ptr8, n: int, state: int) -> int:
+    x = uint(state)
+    for i in range(n):
+        x ^= (x & 0x1FFFF) << 13
+        x ^= x >> 17
+        x ^= (x & 0x1FFFFFF) << 5
+        buf[i] = x & 0xFF
+    return int(x)
+
+
+_pool = b""  # Random bytes, drawn from the RNG 4KiB at a time
+_pidx = 0
+
+
+# Return n random bytes from the pool, refilling it when exhausted. This avoids
+# a hardware RNG access for every small request. Large requests bypass the pool.
+def rand(n):
+    global _pool, _pidx
+    if n > _POOLSIZE:
+        return uos.urandom(n)
+    if _pidx + n > len(_pool):
+        _pool = uos.urandom(_POOLSIZE)
+        _pidx = 0
+    _pidx += n
+    return _pool[_pidx - n : _pidx]